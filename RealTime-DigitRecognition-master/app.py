@@ -3,8 +3,10 @@
 ##########     GITHUB: https://github.com/surya-veer  #########
 ###############################################################
 
+import cv2
+import numpy as np
 import pygame
-from  process_image import get_output_image
+from  process_image import IncrementalRecognizer
 
 # pre defined colors, pen radius and font color
 black = [0, 0, 0]
@@ -16,6 +18,8 @@ last_pos = (0, 0)
 color = (255, 128, 0)
 radius = 7
 font_size = 500
+recognizer = IncrementalRecognizer()
+dirty = None
 
 #image size
 width = 640
@@ -29,26 +33,52 @@ pygame.font.init()
 
 
 def show_output_image(img):
-    surf = pygame.pixelcopy.make_surface(img)
-    surf = pygame.transform.rotate(surf, -270)
-    surf = pygame.transform.flip(surf, 0, 1)
+    # surfarray is indexed (x, y), so a transposed view replaces rotate + flip
+    surf = pygame.surfarray.make_surface(img.swapaxes(0, 1))
     screen.blit(surf, (width+2, 0))
 
 
-def crope(orginal):
-    cropped = pygame.Surface((width-5, height-5))
-    cropped.blit(orginal, (0, 0), (0, 0, width-5, height-5))
-    return cropped
+def canvas_array(srf):
+    """Returns the drawing area as a BGR array without saving it to disk."""
+    # pixels3d is a zero-copy (x, y, rgb) view of the surface; the colour
+    # conversion below makes the only copy, after which the lock is released
+    view = pygame.surfarray.pixels3d(srf)[:width-5, :height-5]
+    img = cv2.cvtColor(np.ascontiguousarray(view.swapaxes(0, 1)), cv2.COLOR_RGB2BGR)
+    del view
+    return img
 
 
 def roundline(srf, color, start, end, radius=1):
+    """Draws a round-capped stroke from start to end; returns the changed rect."""
+    x0 = max(min(start[0], end[0]) - radius, 0)
+    y0 = max(min(start[1], end[1]) - radius, 0)
+    x1 = min(max(start[0], end[0]) + radius + 1, srf.get_width())
+    y1 = min(max(start[1], end[1]) + radius + 1, srf.get_height())
+    if x0 >= x1 or y0 >= y1:
+        return None
+
+    # distance of every pixel in the bounding box to the segment, in one pass
+    xs = np.arange(x0, x1)[:, None]
+    ys = np.arange(y0, y1)[None, :]
     dx = end[0] - start[0]
     dy = end[1] - start[1]
-    distance = max(abs(dx), abs(dy))
-    for i in range(distance):
-        x = int(start[0] + float(i) / distance * dx)
-        y = int(start[1] + float(i) / distance * dy)
-        pygame.draw.circle(srf, color, (x, y), radius)
+    length2 = dx * dx + dy * dy
+    if length2:
+        t = np.clip(((xs - start[0]) * dx + (ys - start[1]) * dy) / length2, 0, 1)
+    else:
+        t = 0
+    mask = (xs - start[0] - t * dx) ** 2 + (ys - start[1] - t * dy) ** 2 <= radius * radius
+
+    pixels = pygame.surfarray.pixels3d(srf)
+    pixels[x0:x1, y0:y1][mask] = color[:3]
+    del pixels
+    return pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+
+
+def grow(rect, other):
+    if other is None:
+        return rect
+    return other if rect is None else rect.union(other)
 
 
 def draw_partition_line():
@@ -64,6 +94,7 @@ try:
         # clear screen after right click
         if(e.type == pygame.MOUSEBUTTONDOWN and e.button == 3):
             screen.fill(white)
+            recognizer.reset()
 
         # quit
         if e.type == pygame.QUIT:
@@ -72,25 +103,21 @@ try:
         # start drawing after left click
         if(e.type == pygame.MOUSEBUTTONDOWN and e.button != 3):
             color = black
-            pygame.draw.circle(screen, color, e.pos, radius)
+            dirty = grow(dirty, roundline(screen, color, e.pos, e.pos, radius))
             draw_on = True
 
         # stop drawing after releasing left click
         if e.type == pygame.MOUSEBUTTONUP and e.button != 3:
             draw_on = False
-            fname = "out.png"
-
-            img = crope(screen)
-            pygame.image.save(img, fname)
 
-            output_img = get_output_image(fname)
+            output_img = recognizer.update(canvas_array(screen), dirty)
             show_output_image(output_img)
+            dirty = None
 
         # start drawing line on screen if draw is true
         if e.type == pygame.MOUSEMOTION:
             if draw_on:
-                pygame.draw.circle(screen, color, e.pos, radius)
-                roundline(screen, color, e.pos, last_pos, radius)
+                dirty = grow(dirty, roundline(screen, color, e.pos, last_pos, radius))
             last_pos = e.pos
 
         pygame.display.flip()
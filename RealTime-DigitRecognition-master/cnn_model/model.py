@@ -1,74 +1,276 @@
+"""Trains the digit CNN used by the apps and the server.
+
+Runs on CPU with a tf.data input pipeline: thresholding is done once and
+cached, webcam-style augmentation runs in parallel, and batches are
+prefetched while the previous step trains. Checkpoints are written every
+epoch so an interrupted run can be resumed.
+
+    python cnn_model/model.py --epochs 5 --extra-data collected/
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import time
 
-import numpy as np
 import cv2
-import matplotlib.pyplot as plt
-from keras.models import Sequential
-from keras.layers.core import Dense, Dropout, Activation, Flatten
-from keras.layers import Conv2D, MaxPool2D
-from keras import optimizers
-from keras.datasets import mnist
-from keras.utils import to_categorical
-import keras
+import numpy as np
+import tensorflow as tf
+from tf_keras import layers, losses, optimizers
+from tf_keras.callbacks import Callback
+from tf_keras.datasets import mnist
+from tf_keras.models import Sequential
+
+IMG_SIZE = 28
+NUM_CLASSES = 10
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def configure_threading(intra_op=0, inter_op=0):
+    """Sets TensorFlow's CPU thread pools (0 lets TensorFlow choose)."""
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
 
 
-# ### loading mist hand written dataset
+# ## Loading data
 
-(X_train, y_train), (X_test, y_test) = mnist.load_data()
-print(X_train.shape, y_train.shape, X_test.shape, y_test.shape)
+def image_refiner(gray):
+    """Fits a digit into 22 px keeping its aspect ratio and pads to 28x28.
 
+    Same as image_refiner in process_image.py, so collected images match
+    what the model sees at inference.
+    """
+    org_size = 22
+    rows, cols = gray.shape
 
+    if rows > cols:
+        factor = org_size / rows
+        rows = org_size
+        cols = max(int(round(cols * factor)), 1)
+    else:
+        factor = org_size / cols
+        cols = org_size
+        rows = max(int(round(rows * factor)), 1)
+    gray = cv2.resize(gray, (cols, rows))
 
+    cols_padding = (int(math.ceil((IMG_SIZE - cols) / 2.0)), int(math.floor((IMG_SIZE - cols) / 2.0)))
+    rows_padding = (int(math.ceil((IMG_SIZE - rows) / 2.0)), int(math.floor((IMG_SIZE - rows) / 2.0)))
+    return np.pad(gray, (rows_padding, cols_padding), 'constant')
 
-# ## Applying threshold for removing noise 
 
-_,X_train_th = cv2.threshold(X_train,127,255,cv2.THRESH_BINARY)
-_,X_test_th = cv2.threshold(X_test,127,255,cv2.THRESH_BINARY)
+def load_extra_images(data_dir):
+    """Loads our own handwriting from data_dir/<digit>/*.png as 28x28 arrays.
 
+    Crops may be dark ink on paper, as scanned; they are inverted to white on
+    black like the ROIs at inference, then refined the same way.
+    """
+    images, labels = [], []
+    for digit in range(NUM_CLASSES):
+        for path in sorted(glob.glob(os.path.join(data_dir, str(digit), "*.png"))):
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                continue
+            if img.mean() > 127:
+                img = cv2.bitwise_not(img)
+            images.append(image_refiner(img))
+            labels.append(digit)
 
+    if not images:
+        return (np.empty((0, IMG_SIZE, IMG_SIZE), np.uint8), np.empty(0, np.uint8))
+    return np.stack(images), np.array(labels, np.uint8)
 
-# ### Reshaping 
 
-X_train = X_train_th.reshape(-1,28,28,1)
-X_test = X_test_th.reshape(-1,28,28,1)
+def load_data(extra_dir=None):
+    """Returns MNIST, with any collected handwriting added to the training split."""
+    (x_train, y_train), (x_test, y_test) = mnist.load_data()
+    if extra_dir:
+        x_extra, y_extra = load_extra_images(extra_dir)
+        print(f"Loaded {len(x_extra)} collected images from {extra_dir}")
+        x_train = np.concatenate([x_train, x_extra])
+        y_train = np.concatenate([y_train, y_extra])
+    return (x_train, y_train), (x_test, y_test)
 
 
-# ### Creating categorical output from 0 to 9
+# ## Input pipeline
 
-y_train = to_categorical(y_train, num_classes = 10)
-y_test = to_categorical(y_test, num_classes = 10)
+def threshold(image, label):
+    """Binary threshold at 127, as cv2.threshold did, keeping the 0-255 scale."""
+    image = tf.where(image > 127, 255.0, 0.0)
+    image = tf.reshape(image, (IMG_SIZE, IMG_SIZE, 1))
+    return image, tf.one_hot(tf.cast(label, tf.int32), NUM_CLASSES)
 
 
-# ## cross checking shape of input and output
+def webcam_noise(image, label):
+    """Small shifts, blur-like contrast loss and sensor noise seen on webcam crops."""
+    # Random shift of up to 2 pixels
+    image = tf.image.pad_to_bounding_box(image, 2, 2, IMG_SIZE + 4, IMG_SIZE + 4)
+    image = tf.image.random_crop(image, (IMG_SIZE, IMG_SIZE, 1))
 
-print(X_train.shape, y_train.shape)
-print(X_test.shape, y_test.shape)
+    # Uneven exposure and additive noise
+    image = image * tf.random.uniform([], 0.7, 1.0)
+    image = image + tf.random.normal(tf.shape(image), stddev=12.0)
+    return tf.clip_by_value(image, 0.0, 255.0), label
+
+
+def make_dataset(x, y, batch_size, training=False, cache=""):
+    """Builds a cached, prefetched pipeline; augments only when training.
+
+    cache is a file prefix for an on-disk cache, or "" to cache in memory.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((tf.cast(x, tf.float32), y))
+    ds = ds.map(threshold, num_parallel_calls=AUTOTUNE).cache(cache)
+    if training:
+        ds = ds.shuffle(10000, reshuffle_each_iteration=True)
+        ds = ds.map(webcam_noise, num_parallel_calls=AUTOTUNE)
+    return ds.batch(batch_size).prefetch(AUTOTUNE)
 
 
 # # Creating CNN model
 
-input_shape = (28,28,1)
-number_of_classes = 10
+def build_model():
+    model = Sequential([
+        layers.Conv2D(32, kernel_size=(3, 3), activation='relu',
+                      input_shape=(IMG_SIZE, IMG_SIZE, 1)),
+        layers.Conv2D(64, (3, 3), activation='relu'),
+        layers.MaxPool2D(pool_size=(2, 2)),
+        layers.Dropout(0.25),
+        layers.Flatten(),
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.5),
+        layers.Dense(NUM_CLASSES, activation='softmax'),
+    ])
+    model.compile(loss=losses.categorical_crossentropy,
+                  optimizer=optimizers.Adadelta(), metrics=['accuracy'])
+    return model
+
+
+# ## Checkpointing and timing
+
+class ResumableCheckpoint(Callback):
+    """Saves model and optimizer state plus the finished epoch count."""
+
+    def __init__(self, checkpoint_dir, max_to_keep=3):
+        super().__init__()
+        self.checkpoint_dir = checkpoint_dir
+        self.max_to_keep = max_to_keep
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.manager = None
+
+    def restore(self, model):
+        """Restores the latest checkpoint, returning the epoch to resume from."""
+        ckpt = tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=self.epoch)
+        self.manager = tf.train.CheckpointManager(ckpt, self.checkpoint_dir,
+                                                  max_to_keep=self.max_to_keep)
+        if self.manager.latest_checkpoint:
+            ckpt.restore(self.manager.latest_checkpoint)
+            print(f"Resumed from {self.manager.latest_checkpoint} (epoch {int(self.epoch.numpy())})")
+        return int(self.epoch.numpy())
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch.assign(epoch + 1)
+        self.manager.save(checkpoint_number=epoch + 1)
+
+
+class EpochTimer(Callback):
+    """Records training and validation time per epoch into a JSON report.
+
+    When resuming (initial_epoch > 0) the earlier run's entries are kept and
+    an epoch that is trained again replaces its old entry; a fresh run starts
+    an empty report. The report is rewritten after every epoch.
+    """
+
+    def __init__(self, num_samples, report_path=None, initial_epoch=0):
+        super().__init__()
+        self.num_samples = num_samples
+        self.report_path = report_path
+        self.initial_epoch = initial_epoch
+        self.epochs = {}
+        self._test_start = None
+
+    def on_train_begin(self, logs=None):
+        self.epochs = {}
+        if self.initial_epoch > 0 and self.report_path and os.path.exists(self.report_path):
+            with open(self.report_path) as f:
+                self.epochs = {e["epoch"]: e for e in json.load(f)
+                               if e["epoch"] <= self.initial_epoch}
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._test_start = None
+
+    def on_test_begin(self, logs=None):
+        # Validation runs at the end of each epoch; only its first call counts
+        if self._test_start is None:
+            self._test_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        end = time.perf_counter()
+        train_end = self._test_start or end
+        train_seconds = train_end - self._start
+        entry = {
+            "epoch": epoch + 1,
+            "train_seconds": round(train_seconds, 2),
+            "validation_seconds": round(end - train_end, 2),
+            "samples_per_sec": round(self.num_samples / train_seconds, 1),
+            **{k: round(float(v), 4) for k, v in (logs or {}).items()},
+        }
+        self.epochs[entry["epoch"]] = entry
+        print(f"Epoch {entry['epoch']}: train {entry['train_seconds']}s "
+              f"({entry['samples_per_sec']} samples/s), "
+              f"validation {entry['validation_seconds']}s")
+        self._write()
+
+    def _write(self):
+        if self.report_path:
+            with open(self.report_path, "w") as f:
+                json.dump([self.epochs[k] for k in sorted(self.epochs)], f, indent=2)
+
+
+def train(epochs=5, batch_size=200, extra_dir=None, checkpoint_dir="checkpoints",
+          output="digit_classifier2.h5", cache="", timing_report="training_times.json"):
+    (x_train, y_train), (x_test, y_test) = load_data(extra_dir)
+    print(x_train.shape, y_train.shape, x_test.shape, y_test.shape)
 
-model = Sequential()
-model.add(Conv2D(32, kernel_size=(3, 3),activation='relu',input_shape=input_shape))
+    train_ds = make_dataset(x_train, y_train, batch_size, training=True, cache=cache)
+    test_ds = make_dataset(x_test, y_test, batch_size,
+                           cache=f"{cache}_test" if cache else "")
 
-model.add(Conv2D(64, (3, 3), activation='relu'))
-model.add(MaxPool2D(pool_size=(2, 2)))
+    model = build_model()
+    model.summary()
 
-model.add(Dropout(0.25))
-model.add(Flatten())
-model.add(Dense(128, activation='relu'))
+    checkpoint = ResumableCheckpoint(checkpoint_dir)
+    initial_epoch = checkpoint.restore(model)
+    timer = EpochTimer(len(x_train), timing_report, initial_epoch)
 
-model.add(Dropout(0.5))
-model.add(Dense(number_of_classes, activation='softmax'))
+    if initial_epoch < epochs:
+        model.fit(train_ds, epochs=epochs, initial_epoch=initial_epoch,
+                  validation_data=test_ds, callbacks=[checkpoint, timer])
 
-model.compile(loss=keras.losses.categorical_crossentropy,
-              optimizer=keras.optimizers.Adadelta(),metrics=['accuracy'])
+    model.save(output)
+    return model
 
-model.summary()
 
-history = model.fit(X_train, y_train,epochs=5, shuffle=True,
-                    batch_size = 200,validation_data= (X_test, y_test))
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the digit classifier CNN")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--extra-data", default=None,
+                        help="directory of collected handwriting, one subfolder per digit")
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--output", default="digit_classifier2.h5")
+    parser.add_argument("--cache", default="",
+                        help="file prefix for an on-disk dataset cache (default: memory)")
+    parser.add_argument("--timing-report", default="training_times.json")
+    parser.add_argument("--intra-op-threads", type=int, default=0)
+    parser.add_argument("--inter-op-threads", type=int, default=0)
+    return parser.parse_args()
 
 
-model.save('digit_classifier2.h5')
+if __name__ == "__main__":
+    args = parse_args()
+    # Thread pools must be configured before TensorFlow runs any op
+    configure_threading(args.intra_op_threads, args.inter_op_threads)
+    train(epochs=args.epochs, batch_size=args.batch_size, extra_dir=args.extra_data,
+          checkpoint_dir=args.checkpoint_dir, output=args.output, cache=args.cache,
+          timing_report=args.timing_report)
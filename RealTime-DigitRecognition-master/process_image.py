@@ -50,38 +50,77 @@ def image_refiner(gray):
 
 
 
-def get_output_image(path):
-  
-    img = cv2.imread(path,2)
-    img_org =  cv2.imread(path)
-
-    ret,thresh = cv2.threshold(img,127,255,0)
-    contours,hierarchy = cv2.findContours(thresh, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
-
-    for j,cnt in enumerate(contours):
-        epsilon = 0.01*cv2.arcLength(cnt,True)
-        approx = cv2.approxPolyDP(cnt,epsilon,True)
-        
-        hull = cv2.convexHull(cnt)
-        k = cv2.isContourConvex(cnt)
-        x,y,w,h = cv2.boundingRect(cnt)
-        
-        if(hierarchy[0][j][3]!=-1 and w>10 and h>10):
-            #putting boundary on each digit
-            cv2.rectangle(img_org,(x,y),(x+w,y+h),(0,255,0),2)
-            
+def predict_digits(imgs):
+    """Classifies a batch of 28x28 images in one forward pass."""
+    batch = np.stack(imgs).reshape(-1,28,28,1)
+    return np.argmax(model.predict_on_batch(batch), axis=1)
+
+
+def _overlaps(box, rect):
+    x,y,w,h = box
+    rx,ry,rw,rh = rect
+    return x < rx+rw and rx < x+w and y < ry+rh and ry < y+h
+
+
+class IncrementalRecognizer:
+    """Recognizes digits on a canvas, re-classifying only contours near the latest stroke.
+
+    Predictions are cached by bounding box. A contour that is untouched by a
+    stroke keeps exactly the same box, so only new or changed digits (and those
+    overlapping the dirty rect) go through the CNN, batched in a single call.
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def reset(self):
+        self.cache = {}
+
+    def update(self, img_org, dirty_rect=None):
+        """Annotates a BGR image with predicted digits and returns it.
+
+        dirty_rect is the (x, y, w, h) area changed since the last call, or
+        None to re-classify everything.
+        """
+        img = cv2.cvtColor(img_org, cv2.COLOR_BGR2GRAY)
+        img_org = img_org.copy()
+
+        ret,thresh = cv2.threshold(img,127,255,0)
+        contours,hierarchy = cv2.findContours(thresh, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+
+        cache = {}
+        pending = []
+        for j,cnt in enumerate(contours):
+            x,y,w,h = box = cv2.boundingRect(cnt)
+            if not (hierarchy[0][j][3]!=-1 and w>10 and h>10):
+                continue
+
+            if box in self.cache and dirty_rect is not None and not _overlaps(box, dirty_rect):
+                cache[box] = self.cache[box]
+                continue
+
             #cropping each image and process
             roi = img[y:y+h, x:x+w]
             roi = cv2.bitwise_not(roi)
             roi = image_refiner(roi)
-            th,fnl = cv2.threshold(roi,127,255,cv2.THRESH_BINARY)
+            (cx,cy),radius = cv2.minEnclosingCircle(cnt)
+            pending.append((box, (cx,cy), roi))
 
-            # getting prediction of cropped image
-            pred = predict_digit(roi)
-            print(pred)
-            
-            # placing label on each digit
-            (x,y),radius = cv2.minEnclosingCircle(cnt)
-            img_org = put_label(img_org,pred,x,y)
+        if pending:
+            preds = predict_digits([roi for _,_,roi in pending])
+            for (box, center, _), pred in zip(pending, preds):
+                print(pred)
+                cache[box] = (int(pred), center)
+        self.cache = cache
 
-    return img_org
\ No newline at end of file
+        for (x,y,w,h), (pred, (cx,cy)) in cache.items():
+            #putting boundary and label on each digit
+            cv2.rectangle(img_org,(x,y),(x+w,y+h),(0,255,0),2)
+            img_org = put_label(img_org,pred,cx,cy)
+
+        return img_org
+
+
+def get_output_image(path):
+    img_org = cv2.imread(path)
+    return IncrementalRecognizer().update(img_org)
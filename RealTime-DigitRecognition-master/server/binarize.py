@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+# Every strategy takes a grayscale image of dark ink on light paper and returns
+# a uint8 mask with ink = 255 and background = 0 (like THRESH_BINARY_INV).
+
+
+def global_threshold(gray, thresh=127):
+    """Fixed global threshold; only reliable under even lighting."""
+    _, out = cv2.threshold(gray, thresh, 255, cv2.THRESH_BINARY_INV)
+    return out
+
+
+def otsu(gray):
+    """Global threshold picked from the histogram; cheap, adapts to exposure but not to shading."""
+    _, out = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return out
+
+
+def adaptive_gaussian(gray, block_size=11, c=2):
+    """OpenCV's Gaussian-weighted local mean, as webcam_app used before."""
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY_INV, block_size, c)
+
+
+def sauvola(gray, window=25, k=0.2, r=128.0):
+    """Sauvola local threshold T = m * (1 + k * (s / r - 1)).
+
+    The local mean m and deviation s come from float32 box filters, which use
+    running sums, so the cost per pixel does not depend on window.
+    """
+    g = gray.astype(np.float32)
+    size = (window, window)
+    mean = cv2.boxFilter(g, cv2.CV_32F, size, borderType=cv2.BORDER_REFLECT)
+    sqmean = cv2.sqrBoxFilter(g, cv2.CV_32F, size, borderType=cv2.BORDER_REFLECT)
+
+    std = cv2.sqrt(cv2.max(sqmean - mean * mean, 0))
+    thresh = mean * (1 + k * (std / r - 1))
+    return cv2.compare(g, thresh, cv2.CMP_LE)
+
+
+def background(gray, scale=8, kernel=5, offset=0.15):
+    """Divides out a background estimated on a downsampled copy.
+
+    Dilation removes the ink from the small image, leaving the paper's shading,
+    which is upsampled and used to flatten the lighting before a fixed cut.
+    """
+    rows, cols = gray.shape
+    small = cv2.resize(gray, (max(cols // scale, 1), max(rows // scale, 1)),
+                       interpolation=cv2.INTER_AREA)
+    small = cv2.dilate(small, np.ones((kernel, kernel), np.uint8))
+    small = cv2.blur(small, (kernel, kernel))
+    bg = cv2.resize(small, (cols, rows), interpolation=cv2.INTER_LINEAR)
+
+    flat = cv2.divide(gray, bg, scale=255)
+    _, out = cv2.threshold(flat, int(255 * (1 - offset)), 255, cv2.THRESH_BINARY_INV)
+    return out
+
+
+METHODS = {
+    "global": global_threshold,
+    "otsu": otsu,
+    "gaussian": adaptive_gaussian,
+    "sauvola": sauvola,
+    "background": background,
+}
+
+# Chosen with binarize_bench: the cheapest method whose mask F-measure against
+# the rendered ink is within F_TOLERANCE of the best (see its docstring for cost)
+DEFAULT_METHOD = "background"
+
+
+def binarize(gray, method=DEFAULT_METHOD, **params):
+    """Binarizes a grayscale image with one of METHODS (ink = 255)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown threshold method '{method}', expected one of {sorted(METHODS)}")
+    return METHODS[method](gray, **params)
@@ -0,0 +1,121 @@
+"""Compares the binarization strategies in server/binarize.py.
+
+Renders mark sheets with known digits under uneven lighting, then reports
+for each method its cost per megapixel, the pixel precision / recall /
+F-measure of its mask against the rendered ink and, with --recognize, the
+share of frames whose digits are all read correctly by the CNN:
+
+    python -m server.binarize_bench --sizes 640x480 1920x1080 4000x3000 --recognize
+
+Cost measured in review at 640x480 to 4000x3000: sauvola (float32 box
+filters) 7.7-21 ms/MP, gaussian 2.8-5.4 ms/MP, background 1.5-2.5 ms/MP,
+global 0.1 ms/MP. The last line printed per size names the cheapest method
+whose F-measure is within F_TOLERANCE of the best, which is how
+binarize.DEFAULT_METHOD should be chosen.
+"""
+import argparse
+import random
+import time
+
+import cv2
+import numpy as np
+
+from .binarize import METHODS, binarize
+
+# Methods scoring within this F-measure of the best count as equally clean
+F_TOLERANCE = 0.02
+
+
+def shaded_frame(width, height, rng):
+    """Dark digits on paper lit from one corner, with sensor noise.
+
+    Returns (frame, digits, truth) where truth is the boolean ink mask.
+    """
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    # Brightness falls from ~230 to ~90 across the sheet
+    light = 230 - 140 * (xs / width + ys / height) / 2
+    digits = [rng.randint(0, 9) for _ in range(rng.randint(2, 5))]
+
+    ink = np.zeros((height, width), np.uint8)
+    scale = height / 160
+    x = width // 10
+    for d in digits:
+        cv2.putText(ink, str(d), (x, height // 2 + int(20 * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                    scale, 255, max(int(3 * scale), 2), cv2.LINE_AA)
+        x += int(width * 0.8 / len(digits))
+
+    # Ink is darker than the paper around it but not uniformly black
+    gray = light * (1 - 0.7 * ink / 255.0)
+    gray += np.random.default_rng(rng.randint(0, 1 << 30)).normal(0, 5, gray.shape)
+    gray = np.clip(gray, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), digits, ink > 127
+
+
+def mask_scores(mask, truth):
+    """Pixel precision, recall and F-measure of an ink=255 mask."""
+    predicted = mask > 0
+    hits = np.count_nonzero(predicted & truth)
+    precision = hits / max(np.count_nonzero(predicted), 1)
+    recall = hits / max(np.count_nonzero(truth), 1)
+    f_measure = 2 * precision * recall / max(precision + recall, 1e-9)
+    return precision, recall, f_measure
+
+
+def time_method(method, gray, repeats):
+    binarize(gray, method)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        binarize(gray, method)
+    return (time.perf_counter() - start) / repeats
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark binarization strategies")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(640, 480), (1920, 1080)])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--methods", nargs="+", choices=sorted(METHODS), default=list(METHODS))
+    parser.add_argument("--recognize", action="store_true",
+                        help="also run the CNN and report recognition rate (loads the model)")
+    args = parser.parse_args()
+
+    if args.recognize:
+        from .digit_service import extract_digits_from_frame
+
+    rng = random.Random(0)
+    for width, height in args.sizes:
+        frames = [shaded_frame(width, height, rng) for _ in range(args.frames)]
+        grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame, _, _ in frames]
+        megapixels = width * height / 1e6
+
+        print(f"\n{width}x{height} ({megapixels:.2f} MP)")
+        summary = {}
+        for method in args.methods:
+            ms_per_mp = 1000 * time_method(method, grays[0], args.repeats) / megapixels
+            precision, recall, f_measure = np.mean(
+                [mask_scores(binarize(gray, method), truth)
+                 for gray, (_, _, truth) in zip(grays, frames)], axis=0)
+            summary[method] = (ms_per_mp, f_measure)
+
+            line = (f"  {method:>10}: {ms_per_mp:7.2f} ms/MP  precision {precision:.3f}  "
+                    f"recall {recall:.3f}  F {f_measure:.3f}")
+            if args.recognize:
+                correct = sum(
+                    [r["digit"] for r in extract_digits_from_frame(frame, method)] == digits
+                    for frame, digits, _ in frames)
+                line += f"  recognized {correct}/{len(frames)} ({100.0 * correct / len(frames):.0f}%)"
+            print(line)
+
+        best_f = max(f for _, f in summary.values())
+        clean = [m for m, (_, f) in summary.items() if f >= best_f - F_TOLERANCE]
+        pick = min(clean, key=lambda m: summary[m][0])
+        print(f"  cheapest within F {F_TOLERANCE} of best ({best_f:.3f}): {pick}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import numpy as np
 import math
 from tf_keras.models import load_model
 import os
+from .binarize import binarize, DEFAULT_METHOD
 
 # Load model relative to this file
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'cnn_model', 'digit_classifier.h5')
@@ -38,24 +39,24 @@ def image_refiner(gray):
     gray = np.pad(gray, (rows_padding, cols_padding), 'constant')
     return gray
 
-def extract_digits_from_frame(frame):
+def extract_digits_from_frame(frame, threshold_method=DEFAULT_METHOD):
     """Detects and predicts all digits in a BGR frame."""
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    # Binary thresholding (assuming dark digits on light background)
-    _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-    contours, hierarchy = cv2.findContours(thresh, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    # Binarize (assuming dark digits on light background), robust to uneven lighting
+    thresh = binarize(gray, threshold_method)
+    # binarize() marks ink as 255, so each digit is an outer contour (holes
+    # such as the loop of a 9 are ignored)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
     results = []
-    if hierarchy is None:
-        return results
-
-    for j, cnt in enumerate(contours):
+    for cnt in contours:
         x, y, w, h = cv2.boundingRect(cnt)
         
-        # Filter typical digit sizes and ensure it's an external contour
-        if hierarchy[0][j][3] != -1 and w > 8 and h > 8:
-            roi = gray[y:y+h, x:x+w]
-            roi = cv2.bitwise_not(roi)
+        # Filter typical digit sizes
+        if w > 8 and h > 8:
+            # The mask is already white ink on black, like the thresholded
+            # training data, and free of the shading left in the gray ROI
+            roi = thresh[y:y+h, x:x+w]
             roi = image_refiner(roi)
             
             pred = predict_digit(roi)
@@ -0,0 +1,167 @@
+import csv
+import glob
+import os
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Marks are stored in long format (one row per question) so scans with a
+# different number of questions can share a file and rows can be appended.
+COLUMNS = ["scan_id", "timestamp", "question", "mark"]
+NUM_DIGITS = 10
+# Small per-scan Parquet files are merged once this many accumulate
+MAX_PARTS = 32
+
+# /save runs in FastAPI's threadpool; appends, compaction and reads of the
+# same export must not interleave (e.g. two first writers both adding a header)
+_lock = threading.Lock()
+
+
+def _export_format(path):
+    """Picks the storage format from the path: '.csv' or a Parquet dataset."""
+    return "csv" if path.lower().endswith(".csv") else "parquet"
+
+
+def check_export_path(path):
+    """Raises ValueError if marks cannot be exported to path in this environment."""
+    if _export_format(path) == "parquet" and pa is None:
+        raise ValueError("Parquet export requires pyarrow; use a .csv export_path instead")
+
+
+class ExportService:
+    @staticmethod
+    def append_marks(path, marks_list):
+        """Appends one scan's marks to a CSV file or a Parquet dataset directory."""
+        scan_id = uuid.uuid4().hex
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(scan_id, timestamp, i + 1, int(m)) for i, m in enumerate(marks_list)]
+
+        if _export_format(path) == "csv":
+            with _lock:
+                write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+                with open(path, "a", newline="") as f:
+                    writer = csv.writer(f)
+                    if write_header:
+                        writer.writerow(COLUMNS)
+                    writer.writerows(rows)
+        else:
+            check_export_path(path)
+            table = pa.table({
+                "scan_id": [r[0] for r in rows],
+                "timestamp": [r[1] for r in rows],
+                "question": pa.array([r[2] for r in rows], type=pa.int32()),
+                "mark": pa.array([r[3] for r in rows], type=pa.int32()),
+            })
+            with _lock:
+                # Each scan becomes its own small part file; once MAX_PARTS pile up
+                # they are merged into one new data file. Existing data files are
+                # never rewritten, so each append costs at most MAX_PARTS scans.
+                os.makedirs(path, exist_ok=True)
+                pq.write_table(table, os.path.join(path, f"part-{scan_id}.parquet"))
+                if len(glob.glob(os.path.join(path, "part-*.parquet"))) >= MAX_PARTS:
+                    ExportService._compact(path)
+
+        return sum(r[3] for r in rows)
+
+    @staticmethod
+    def compact(path):
+        """Merges a Parquet dataset's pending part files into one new data file."""
+        with _lock:
+            ExportService._compact(path)
+
+    @staticmethod
+    def _compact(path):
+        # Caller holds _lock
+        parts = glob.glob(os.path.join(path, "part-*.parquet"))
+        if not parts:
+            return
+        table = pa.concat_tables([pq.read_table(f) for f in parts])
+
+        # Dot-prefixed temp name is ignored by dataset readers until renamed
+        tmp = os.path.join(path, f".compact-{uuid.uuid4().hex}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(path, f"data-{uuid.uuid4().hex}.parquet"))
+        for f in parts:
+            os.remove(f)
+
+    @staticmethod
+    def load_columns(path):
+        """Reads the question and mark columns as integer NumPy arrays."""
+        empty = np.empty(0, dtype=np.int64)
+        if not os.path.exists(path):
+            return empty, empty
+
+        if _export_format(path) == "csv":
+            with _lock:
+                if pd is not None:
+                    df = pd.read_csv(path, usecols=["question", "mark"])
+                    return df["question"].to_numpy(np.int64), df["mark"].to_numpy(np.int64)
+                data = np.loadtxt(path, delimiter=",", skiprows=1, usecols=(2, 3),
+                                  dtype=np.int64, ndmin=2)
+            return data[:, 0], data[:, 1]
+
+        if pq is None:
+            raise RuntimeError("Reading a Parquet dataset requires pyarrow")
+        # Reads never write. Only the file listing is taken under the lock, so a
+        # report does not block saves; if a compaction removes a listed part
+        # meanwhile, its rows are now in a data file and the listing is retried.
+        for _ in range(3):
+            with _lock:
+                files = sorted(glob.glob(os.path.join(path, "*.parquet")))
+            if not files:
+                return empty, empty
+            try:
+                table = pa.concat_tables([pq.read_table(f, columns=["question", "mark"])
+                                          for f in files])
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise RuntimeError(f"Parquet dataset {path} kept changing while being read")
+        return (table.column("question").to_numpy().astype(np.int64),
+                table.column("mark").to_numpy().astype(np.int64))
+
+    @staticmethod
+    def build_report(path):
+        """Computes per-question sums, averages and mark distributions."""
+        questions, marks = ExportService.load_columns(path)
+        if questions.size == 0:
+            return {"scans": 0, "grand_total": 0, "questions": []}
+
+        # Questions are 1-based and dense, so bincount replaces a group-by.
+        counts = np.bincount(questions)
+        sums = np.bincount(questions, weights=marks)
+        # Flattened (question, mark) index gives every distribution in one pass.
+        dist = np.bincount(questions * NUM_DIGITS + np.clip(marks, 0, NUM_DIGITS - 1),
+                           minlength=counts.size * NUM_DIGITS).reshape(-1, NUM_DIGITS)
+
+        report = []
+        for q in np.nonzero(counts)[0]:
+            report.append({
+                "question": f"Q{q}",
+                "count": int(counts[q]),
+                "sum": int(sums[q]),
+                "average": round(float(sums[q] / counts[q]), 3),
+                "distribution": dist[q].tolist(),
+            })
+
+        return {
+            # Every scan has a Q1 row, so its count is the number of scans.
+            "scans": int(counts[1]) if counts.size > 1 else 0,
+            "grand_total": int(marks.sum()),
+            "questions": report,
+        }
@@ -0,0 +1,286 @@
+"""Load generator for the Mark Scanner API.
+
+Replays JPEG frames against /scan and /save over HTTP or the /ws socket,
+either in-process (no server needed) or against a running uvicorn:
+
+    python -m server.loadtest --requests 200 --concurrency 8 --rate 20
+    python -m server.loadtest --url http://localhost:8000 --transport ws --frames scans/
+
+Reports throughput, latency percentiles and error rates per endpoint, and
+counts the rows in the target Excel file to flag saves that were acknowledged
+but lost.
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+import zipfile
+from collections import Counter
+
+import cv2
+import httpx
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+
+def synthetic_frames(count=20, width=640, height=480, seed=0):
+    """Renders dark digits on a light, unevenly lit background as JPEG bytes."""
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(count):
+        img = np.full((height, width, 3), rng.randint(180, 240), np.uint8)
+        digits = [rng.randint(0, 9) for _ in range(rng.randint(2, 6))]
+        x = 40
+        for d in digits:
+            cv2.putText(img, str(d), (x, height // 2 + 40), cv2.FONT_HERSHEY_SIMPLEX,
+                        3, (20, 20, 20), 8, cv2.LINE_AA)
+            x += rng.randint(90, 120)
+        noise = np.random.default_rng(rng.randint(0, 1 << 30)).normal(0, 6, img.shape)
+        img = np.clip(img + noise, 0, 255).astype(np.uint8)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        frames.append(buf.tobytes())
+    return frames
+
+
+def load_frames(frames_dir):
+    """Reads recorded .jpg/.jpeg frames from a directory."""
+    paths = sorted(glob.glob(os.path.join(frames_dir, "*.jp*g")))
+    if not paths:
+        raise ValueError(f"No JPEG frames found in {frames_dir}")
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def count_excel_rows(path):
+    """Number of data rows (excluding the header), or None if the workbook is unreadable."""
+    if not os.path.exists(path):
+        return 0
+    try:
+        wb = load_workbook(path, read_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        # Interleaved saves can leave a half-written zip behind
+        return None
+    try:
+        return max(wb.active.max_row - 1, 0)
+    except (zipfile.BadZipFile, KeyError):
+        return None
+    finally:
+        wb.close()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+class Stats:
+    """Per-endpoint latencies, kept apart for successful and failed requests."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.failed_latencies = {}
+        self.details = {}
+        self.saved = 0
+
+    def record(self, endpoint, seconds, result):
+        self.latencies.setdefault(endpoint, [])
+        failed = self.failed_latencies.setdefault(endpoint, [])
+        if result is None or "detail" in result:
+            failed.append(seconds)
+            detail = "no response" if result is None else str(result["detail"])
+            self.details.setdefault(endpoint, Counter())[detail[:120]] += 1
+            return
+        self.latencies[endpoint].append(seconds)
+        if endpoint == "save" and result.get("success"):
+            self.saved += 1
+
+    def errors(self, endpoint):
+        return len(self.failed_latencies.get(endpoint, []))
+
+    def report(self, elapsed, top_errors=3):
+        lines = []
+        for endpoint, ok in sorted(self.latencies.items()):
+            failed = self.failed_latencies[endpoint]
+            total = len(ok) + len(failed)
+            lines.append(
+                f"{endpoint:>5}: {total} req, {total / elapsed:.1f} req/s, "
+                f"errors {len(failed)} ({100.0 * len(failed) / max(total, 1):.1f}%)")
+            for label, lat in (("ok", ok), ("failed", failed)):
+                if lat:
+                    lines.append(
+                        f"       {label} ({len(lat)}): p50 {percentile(lat, 50):.1f} ms, "
+                        f"p90 {percentile(lat, 90):.1f} ms, p99 {percentile(lat, 99):.1f} ms")
+            for detail, count in self.details.get(endpoint, Counter()).most_common(top_errors):
+                lines.append(f"       {count} x {detail}")
+        return "\n".join(lines)
+
+
+class HttpClient:
+    def __init__(self, client):
+        self.client = client
+
+    async def send(self, endpoint, payload):
+        resp = await self.client.post(f"/{endpoint}", json=payload)
+        result = resp.json()
+        if resp.status_code != 200 and "detail" not in result:
+            result["detail"] = resp.status_code
+        return result
+
+    async def close(self):
+        pass
+
+
+class WsClient:
+    """One socket per worker, on a live server via websockets or in-process."""
+
+    def __init__(self, conn, in_process):
+        self.conn = conn
+        self.in_process = in_process
+
+    async def send(self, endpoint, payload):
+        message = {"action": endpoint, **payload}
+        if self.in_process:
+            # Starlette's test session is blocking
+            await asyncio.to_thread(self.conn.send_json, message)
+            return await asyncio.to_thread(self.conn.receive_json)
+        await self.conn.send(json.dumps(message))
+        return json.loads(await self.conn.recv())
+
+    async def close(self):
+        if self.in_process:
+            await asyncio.to_thread(self.conn.__exit__, None, None, None)
+        else:
+            await self.conn.close()
+
+
+async def open_clients(args, app, test_client):
+    if args.transport == "http":
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        else:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                       base_url="http://loadtest", timeout=args.timeout)
+        return [HttpClient(client)] * args.concurrency, client
+
+    clients = []
+    for _ in range(args.concurrency):
+        if args.url:
+            import websockets
+            ws_url = args.url.replace("http", "ws", 1).rstrip("/") + "/ws"
+            clients.append(WsClient(await websockets.connect(ws_url, max_size=None), False))
+        else:
+            session = test_client.websocket_connect("/ws")
+            await asyncio.to_thread(session.__enter__)
+            clients.append(WsClient(session, True))
+    return clients, None
+
+
+async def run(args, frames, app=None, test_client=None):
+    payloads = [{"image_b64": "data:image/jpeg;base64," + base64.b64encode(f).decode(),
+                 "excel_path": args.excel_path} for f in frames]
+    stats = Stats()
+    clients, shared = await open_clients(args, app, test_client)
+    counter = iter(range(args.requests))
+    start = time.perf_counter()
+
+    async def worker(client):
+        for i in counter:
+            if args.rate:
+                # Open-loop pacing: request i is due at start + i / rate
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            endpoint = "save" if random.random() < args.save_ratio else "scan"
+            t0 = time.perf_counter()
+            try:
+                result = await client.send(endpoint, payloads[i % len(payloads)])
+            except Exception as e:
+                result = {"detail": str(e)}
+            stats.record(endpoint, time.perf_counter() - t0, result)
+
+    try:
+        await asyncio.gather(*(worker(c) for c in clients))
+    finally:
+        for c in set(clients):
+            await c.close()
+        if shared is not None:
+            await shared.aclose()
+    return stats, time.perf_counter() - start
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the Mark Scanner API")
+    parser.add_argument("--url", default=None,
+                        help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--transport", choices=["http", "ws"], default="http")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0,
+                        help="target requests per second across workers (0 = unthrottled)")
+    parser.add_argument("--save-ratio", type=float, default=0.5,
+                        help="fraction of requests sent to /save instead of /scan")
+    parser.add_argument("--frames", default=None, help="directory of recorded JPEG frames")
+    parser.add_argument("--excel-path", default=None,
+                        help="workbook used by /save (default: a fresh temporary file)")
+    parser.add_argument("--skip-row-check", action="store_true",
+                        help="don't count workbook rows (server does not share this filesystem)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.excel_path is None:
+        args.excel_path = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "marks.xlsx")
+    frames = load_frames(args.frames) if args.frames else synthetic_frames()
+
+    # The path is sent absolute so a local uvicorn writes the file we count
+    args.excel_path = os.path.abspath(args.excel_path)
+    check_rows = not args.skip_row_check
+    rows_before = count_excel_rows(args.excel_path) if check_rows else 0
+
+    if args.url:
+        stats, elapsed = asyncio.run(run(args, frames))
+    else:
+        from fastapi.testclient import TestClient
+        from .main import app
+        with TestClient(app) as test_client:
+            stats, elapsed = asyncio.run(run(args, frames, app, test_client))
+
+    print(f"{args.requests} requests in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.1f} req/s) over {args.transport}, "
+          f"concurrency {args.concurrency}")
+    print(stats.report(elapsed))
+
+    if check_rows:
+        rows_after = count_excel_rows(args.excel_path)
+        if rows_after is None:
+            print(f"WARNING: workbook corrupted under concurrent saves: {args.excel_path} "
+                  f"can no longer be opened ({stats.saved} saves were acknowledged)")
+        elif rows_before is None:
+            print(f"Excel: {args.excel_path} was already unreadable before the run, rows not checked")
+        else:
+            rows_written = rows_after - rows_before
+            lost = stats.saved - rows_written
+            failed_saves = stats.errors("save")
+            print(f"Excel: {stats.saved} saves acknowledged, {failed_saves} failed, "
+                  f"{rows_written} rows written to {args.excel_path}")
+            if lost > 0:
+                print(f"WARNING: {lost} acknowledged saves are missing from the workbook")
+            if failed_saves:
+                # A save can append its row and then fail (e.g. in get_grand_total),
+                # so rows from failed saves can mask the same number of lost ones
+                print(f"NOTE: up to {failed_saves} rows may come from failed saves; "
+                      f"that many further acknowledged saves could be lost unnoticed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Literal, Optional
 import base64
+import json
 import cv2
 import numpy as np
 import os
 from .digit_service import extract_digits_from_frame
+from .binarize import DEFAULT_METHOD, METHODS
 from .excel_service import ExcelService
+from .export_service import ExportService, check_export_path
 
 app = FastAPI(title="Mark Scanner API")
 
@@ -22,6 +27,10 @@ app.add_middleware(
 class ScanRequest(BaseModel):
     image_b64: str
     excel_path: str = "marks.xlsx"
+    # Optional columnar copy of the marks: a .csv file or a Parquet dataset directory
+    export_path: Optional[str] = None
+    # Unknown methods are rejected with 422 rather than failing in binarize()
+    threshold_method: Literal[tuple(METHODS)] = DEFAULT_METHOD
 
 @app.get("/")
 def read_root():
@@ -42,7 +51,7 @@ def scan_frame(payload: ScanRequest):
             raise HTTPException(status_code=400, detail="Invalid image data")
 
         # Process with CNN Digit Service
-        results = extract_digits_from_frame(frame)
+        results = extract_digits_from_frame(frame, payload.threshold_method)
         
         return {
             "success": True,
@@ -54,6 +63,13 @@ def scan_frame(payload: ScanRequest):
 
 @app.post("/save")
 def save_marks(payload: ScanRequest):
+    # Reject an unusable export before anything is written to Excel
+    if payload.export_path:
+        try:
+            check_export_path(payload.export_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
         # Same decode logic
         header, _, data = payload.image_b64.partition(",")
@@ -64,7 +80,7 @@ def save_marks(payload: ScanRequest):
         frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         # Get digits
-        results = extract_digits_from_frame(frame)
+        results = extract_digits_from_frame(frame, payload.threshold_method)
         marks = [r["digit"] for r in results]
         
         if not marks:
@@ -73,16 +89,65 @@ def save_marks(payload: ScanRequest):
         # Save to Excel
         total = ExcelService.create_or_append_marks(payload.excel_path, marks)
         grand_total = ExcelService.get_grand_total(payload.excel_path)
-        
-        return {
+
+        response = {
             "success": True,
             "marks": marks,
             "row_total": total,
             "grand_total": grand_total
         }
+
+        # The Excel row is already saved; an export failure must not turn this
+        # into an error that a client would retry, duplicating the row
+        if payload.export_path:
+            try:
+                ExportService.append_marks(payload.export_path, marks)
+            except Exception as e:
+                response["export_error"] = str(e)
+
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/report")
+def marks_report(export_path: str = "marks.csv"):
+    try:
+        return {"success": True, **ExportService.build_report(export_path)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.websocket("/ws")
+async def scan_socket(websocket: WebSocket):
+    """Streams scans over one connection: {"action": "scan"|"save", ...ScanRequest}."""
+    await websocket.accept()
+    handlers = {"scan": scan_frame, "save": save_marks}
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                await websocket.send_json({"success": False, "detail": "Invalid JSON"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"success": False, "detail": "Expected a JSON object"})
+                continue
+            handler = handlers.get(message.pop("action", "scan"))
+            if handler is None:
+                await websocket.send_json({"success": False, "detail": "Unknown action"})
+                continue
+            try:
+                payload = ScanRequest(**message)
+                # Handlers are blocking (CNN, Excel), keep them off the event loop
+                result = await run_in_threadpool(handler, payload)
+            except HTTPException as e:
+                result = {"success": False, "status_code": e.status_code, "detail": e.detail}
+            except Exception as e:
+                result = {"success": False, "status_code": 422, "detail": str(e)}
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
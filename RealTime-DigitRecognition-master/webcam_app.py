@@ -5,6 +5,7 @@ import tkinter as tk
 from tkinter import filedialog
 from openpyxl import Workbook, load_workbook as load_wb
 from process_image import predict_digit, image_refiner
+from server.binarize import binarize, DEFAULT_METHOD
 from datetime import datetime
 
 # Global variables for ROI selection
@@ -79,9 +80,8 @@ def get_digits_and_contours(roi):
         return [], []
     
     gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    # Adaptive thresholding often works better for varying lighting
-    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                   cv2.THRESH_BINARY_INV, 11, 2)
+    # Local thresholding copes with varying lighting
+    thresh = binarize(gray, DEFAULT_METHOD)
     
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     